@@ -1,13 +1,32 @@
 import boto3
 import time
 from concurrent.futures import ThreadPoolExecutor
-from botocore.exceptions import ClientError, WaiterError
-from datetime import datetime
+from functools import lru_cache
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, WaiterError
+from datetime import datetime, timezone
 import argparse
+import atexit
+import logging
+import queue
 import threading
 import sys
-
-# Thread-safe print
+from logging.handlers import QueueHandler, QueueListener
+
+# Workers only enqueue log records; a single listener thread writes them to stdout
+log_queue = queue.Queue()
+log_output = logging.StreamHandler(sys.stdout)
+log_output.setFormatter(logging.Formatter("%(asctime)s %(threadName)s [%(levelname)s] %(message)s"))
+log_listener = QueueListener(log_queue, log_output)
+# The QueueHandler needs no formatter of its own; log_output formats each record once
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(QueueHandler(log_queue))
+logger = logging.getLogger(__name__)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+# Guards the buffered DynamoDB records
 lock = threading.Lock()
 
 # Step 1: Parse CLI arguments
@@ -22,32 +41,75 @@ INSTANCE_ID = args.instance_id
 volume_ids_csv = args.volume_ids 
 
 # Step 2: Initialize Boto3 clients/resources with dynamic region
-dynamodb_client = boto3.client('dynamodb', region_name=REGION)
-dynamodb_resource = boto3.resource('dynamodb', region_name=REGION)
-ec2 = boto3.client("ec2", region_name=REGION)
-ec2_resource = boto3.resource("ec2", region_name=REGION)
+# One session for all clients; the pool is sized above MAX_WORKERS so threads
+# never queue for a connection, and adaptive retries throttle bursts client-side.
+MAX_WORKERS = 16
+session = boto3.session.Session(region_name=REGION)
+aws_config = Config(
+    max_pool_connections=64,
+    retries={"mode": "adaptive", "max_attempts": 10},
+    tcp_keepalive=True,
+)
+dynamodb_resource = session.resource('dynamodb', config=aws_config)
+# Reuse the resource's own client rather than building a second one
+dynamodb_client = dynamodb_resource.meta.client
+ec2 = session.client("ec2", config=aws_config)
+
+# Warm the EC2 client in the background while the DynamoDB tables are checked:
+# load the paginator model and open a pooled TLS connection, so the first
+# describe_volumes doesn't pay for either. Failures only cost the warm-up.
+def prewarm_ec2():
+    try:
+        ec2.get_paginator("describe_volumes")
+        ec2.describe_regions(RegionNames=[REGION])
+    except Exception as e:
+        logger.debug(f"EC2 pre-warm skipped: {e}")
+
+threading.Thread(target=prewarm_ec2, name="Prewarm", daemon=True).start()
 
 # Step 3: Table names
 OLD_TABLE_NAME = 'EBSVolumeSwapBeforeSnapshot'
 NEW_TABLE_NAME = 'EBSVolumeSwapApplySnapshot'
 
 # Step 4: Create DynamoDB tables if not exist
-def create_table_if_not_exists(table_name, key_name):
+# Roles without CreateTable get AccessDeniedException even when the table is
+# already there. DescribeTable answers that directly; ListTables is the fallback
+# because the original existence check needed it, so older roles still grant it.
+def table_exists(table_name):
     try:
-        existing = dynamodb_client.list_tables()["TableNames"]
-        if table_name in existing:
-            print(f"[INFO] Table '{table_name}' already exists.")
-            return
+        dynamodb_client.describe_table(TableName=table_name)
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ResourceNotFoundException":
+            return False
+    try:
+        pages = dynamodb_client.get_paginator("list_tables").paginate()
+        return any(table_name in page["TableNames"] for page in pages)
+    except ClientError:
+        return False
 
+# Creating directly and treating ResourceInUseException as "exists" avoids a
+# list_tables scan on every run.
+def create_table_if_not_exists(table_name, key_name):
+    try:
         dynamodb_client.create_table(
             TableName=table_name,
             KeySchema=[{'AttributeName': key_name, 'KeyType': 'HASH'}],
             AttributeDefinitions=[{'AttributeName': key_name, 'AttributeType': 'S'}],
-            ProvisionedThroughput={'ReadCapacityUnits': 26, 'WriteCapacityUnits': 26}
+            # A few dozen writes per run: on-demand absorbs the burst without idle capacity
+            BillingMode='PAY_PER_REQUEST'
         )
-        print(f"[INFO] Table '{table_name}' created.")
+        # Writes would fail while the table is still CREATING
+        dynamodb_client.get_waiter('table_exists').wait(TableName=table_name)
+        logger.info(f"Table '{table_name}' created.")
     except ClientError as e:
-        print(f"[ERROR] Failed to create table {table_name}: {e}")
+        code = e.response["Error"]["Code"]
+        if code == "ResourceInUseException" or (code == "AccessDeniedException" and table_exists(table_name)):
+            logger.info(f"Table '{table_name}' already exists.")
+            return
+        logger.error(f"Failed to create table {table_name}: {e}")
+    except WaiterError as we:
+        logger.error(f"Table {table_name} did not become active: {we}")
 
 create_table_if_not_exists(OLD_TABLE_NAME, 'old_volume_id')
 create_table_if_not_exists(NEW_TABLE_NAME, 'new_volume')
@@ -56,135 +118,253 @@ create_table_if_not_exists(NEW_TABLE_NAME, 'new_volume')
 old_table = dynamodb_resource.Table(OLD_TABLE_NAME)
 new_table = dynamodb_resource.Table(NEW_TABLE_NAME)
 
+# Workers only buffer records in memory; flush_records() writes them from main()
+# with one batch writer per table (BatchWriteItem calls of up to 25 items).
+old_records = []
+new_records = []
+
 # Step 6: Logging functions
-def record_old_volume(volume_id, instance_id, instance_name, device_name, size, iops, throughput, snapshot_id):
-    try:
-        old_table.put_item(
-            Item={
-                "old_volume_id": volume_id,
-                "name": f"OLD-{volume_id}",
-                "instancename": instance_name,
-                "instance_id": instance_id,
-                "devicename": device_name,
-                "size": int(size),
-                "iops": int(iops),
-                "throughput": int(throughput),
-                "snapshotid": snapshot_id,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
-        print(f"[INFO] Logged OLD volume {volume_id} into DynamoDB.")
-    except Exception as e:
-        print(f"[ERROR] Failed to log old volume {volume_id}: {e}")
+def record_old_volume(volume_id, instance_id, instance_name, device_name, size, iops, throughput, snapshot_id,
+                      timestamp):
+    with lock:
+        old_records.append({
+            "old_volume_id": volume_id,
+            "name": f"OLD-{volume_id}",
+            "instancename": instance_name,
+            "instance_id": instance_id,
+            "devicename": device_name,
+            "size": int(size),
+            "iops": int(iops),
+            "throughput": int(throughput),
+            "snapshotid": snapshot_id,
+            "timestamp": timestamp
+        })
+    logger.info(f"Queued OLD volume {volume_id} for DynamoDB.")
 
 def record_new_volume(new_volume_id, snapshot_id, instance_id, instance_name, device_name,
-                      size, iops, throughput, volume_type, az, sg_names):
-    try:
-        new_table.put_item(
-            Item={
-                "new_volume": new_volume_id,
-                "source_snapshot": snapshot_id,
-                "instance_id": instance_id,
-                "instancename": instance_name,
-                "devicename": device_name,
-                "size": int(size),
-                "iops": int(iops),
-                "throughput": int(throughput),
-                "volume_type": volume_type,
-                "availability_zone": az,
-                "security_group_names": sg_names,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        )
-        print(f"[INFO] Logged NEW volume {new_volume_id} into DynamoDB.")
-    except Exception as e:
-        print(f"[ERROR] Failed to log new volume {new_volume_id}: {e}")
+                      size, iops, throughput, volume_type, az, sg_names, timestamp):
+    with lock:
+        new_records.append({
+            "new_volume": new_volume_id,
+            "source_snapshot": snapshot_id,
+            "instance_id": instance_id,
+            "instancename": instance_name,
+            "devicename": device_name,
+            "size": int(size),
+            "iops": int(iops),
+            "throughput": int(throughput),
+            "volume_type": volume_type,
+            "availability_zone": az,
+            "security_group_names": sg_names,
+            "timestamp": timestamp
+        })
+    logger.info(f"Queued NEW volume {new_volume_id} for DynamoDB.")
+
+# Returns the number of tables whose records could not be written
+def flush_records():
+    errors = 0
+    for table, key_name, records in ((old_table, "old_volume_id", old_records),
+                                     (new_table, "new_volume", new_records)):
+        if not records:
+            continue
+        try:
+            with table.batch_writer(overwrite_by_pkeys=[key_name]) as writer:
+                for item in records:
+                    writer.put_item(Item=item)
+            logger.info(f"Wrote {len(records)} record(s) to {table.name}.")
+        except (ClientError, BotoCoreError) as e:
+            logger.error(f"Failed to write {len(records)} record(s) to {table.name}: {e}")
+            errors += 1
+    return errors
 
 # Step 7: Utility functions
-EXCLUDE_DEVICES = ["/dev/sda1", "/dev/xvda"]
+EXCLUDE_DEVICES = frozenset({"/dev/sda1", "/dev/xvda"})
+
+# Volume types that accept a provisioned Iops / Throughput on create_volume
+IOPS_VOLUME_TYPES = frozenset({"io1", "io2", "gp3"})
+THROUGHPUT_VOLUME_TYPES = frozenset({"gp3"})
+
+# Shared state polling: one describe call per interval covers every pending id
+WATCH_INTERVAL = 5
+SNAPSHOT_TIMEOUT = 600
+VOLUME_TIMEOUT = 600
+
+# Replaces one boto waiter per worker with a single polling thread per resource
+# kind. Workers register an id and block on an Event; the thread describes all
+# pending ids in one call every WATCH_INTERVAL and wakes the ones that are done.
+# It starts on the first wait() and exits once nothing is pending.
+class StateWatcher:
+    def __init__(self, name, describe_states):
+        self.name = name
+        self.describe_states = describe_states
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def wait(self, resource_id, target_state, timeout, failed_states=()):
+        entry = {"target": target_state, "failed": failed_states, "state": None,
+                 "event": threading.Event()}
+        with self.lock:
+            self.pending[resource_id] = entry
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"{self.name}Watcher", daemon=True)
+                self.thread.start()
+
+        if not entry["event"].wait(timeout):
+            with self.lock:
+                self.pending.pop(resource_id, None)
+            raise WaiterError(self.name, f"Timed out waiting for {resource_id}", {})
+        if entry["state"] != target_state:
+            raise WaiterError(self.name, f"{resource_id} entered {entry['state']} state", {})
+
+    def _run(self):
+        try:
+            while True:
+                time.sleep(WATCH_INTERVAL)
+                with self.lock:
+                    resource_ids = list(self.pending)
+                    if not resource_ids:
+                        self.thread = None
+                        return
+                # Any poll failure (throttling, endpoint or read timeouts after
+                # retries) is retried next interval rather than killing the poller
+                try:
+                    states = self.describe_states(resource_ids)
+                except Exception as e:
+                    logger.warning(f"{self.name} poll failed, retrying: {e}")
+                    continue
+                with self.lock:
+                    for resource_id, state in states.items():
+                        entry = self.pending.get(resource_id)
+                        if entry and (state == entry["target"] or state in entry["failed"]):
+                            entry["state"] = state
+                            entry["event"].set()
+                            del self.pending[resource_id]
+        finally:
+            # On an unexpected exit, let the next wait() start a fresh poller
+            with self.lock:
+                if self.thread is threading.current_thread():
+                    self.thread = None
+
+# id filters (rather than SnapshotIds/VolumeIds) skip ids that are not visible
+# yet instead of failing the whole batch
+def describe_snapshot_states(snapshot_ids):
+    response = ec2.describe_snapshots(
+        OwnerIds=["self"],
+        Filters=[{"Name": "snapshot-id", "Values": snapshot_ids}]
+    )
+    return {snap["SnapshotId"]: snap["State"] for snap in response["Snapshots"]}
+
+def describe_volume_states(volume_ids):
+    response = ec2.describe_volumes(Filters=[{"Name": "volume-id", "Values": volume_ids}])
+    return {vol["VolumeId"]: vol["State"] for vol in response["Volumes"]}
+
+snapshot_watcher = StateWatcher("SnapshotCompleted", describe_snapshot_states)
+volume_watcher = StateWatcher("VolumeAvailable", describe_volume_states)
 
 def merge_tags(base_tags, new_tags):
-    tag_dict = {tag["Key"]: tag["Value"] for tag in base_tags}
-    for tag in new_tags:
-        tag_dict[tag["Key"]] = tag["Value"]
+    # Later keys win, so new_tags override base_tags
+    tag_dict = {tag["Key"]: tag["Value"] for tag in base_tags + new_tags}
     return [{"Key": k, "Value": v} for k, v in tag_dict.items()]
 
-def get_filtered_attached_volumes(instance_id, volume_ids_csv):
+# Describe the instance once per run: returns (instance_info, name_tag, sg_names)
+@lru_cache(maxsize=None)
+def describe_instance_once(instance_id):
+    instance_info = ec2.describe_instances(InstanceIds=[instance_id])["Reservations"][0]["Instances"][0]
+    sg_names = ",".join([sg["GroupName"] for sg in instance_info.get("SecurityGroups", [])])
+    name_tag = next((tag["Value"] for tag in instance_info.get("Tags", []) if tag["Key"] == "Name"), "Unknown")
+    return instance_info, name_tag, sg_names
+
+# Returns None for "all volumes", otherwise a deduplicated frozenset of ids
+def parse_volume_ids(volume_ids_csv):
+    if not volume_ids_csv or volume_ids_csv == "AllVolumes" or not volume_ids_csv.strip():
+        return None
+    return frozenset(v.strip() for v in volume_ids_csv.split("|") if v.strip())
+
+# A single describe_volumes filtered on the instance returns each volume's
+# attachment and attributes, so no describe_instances or per-volume load is needed.
+# volume_ids=None selects every attached volume outside EXCLUDE_DEVICES.
+def get_attached_volumes(instance_id, volume_ids=None):
     try:
-        volume_ids = [v.strip() for v in volume_ids_csv.strip().split("|") if v.strip()]
-        response = ec2.describe_instances(InstanceIds=[instance_id])
+        paginator = ec2.get_paginator("describe_volumes")
+        pages = paginator.paginate(Filters=[{"Name": "attachment.instance-id", "Values": [instance_id]}])
         volumes = []
 
-        for reservation in response["Reservations"]:
-            for instance in reservation["Instances"]:
-                for mapping in instance.get("BlockDeviceMappings", []):
-                    device = mapping.get("DeviceName")
-                    volume_id = mapping.get("Ebs", {}).get("VolumeId")
-                    if device not in EXCLUDE_DEVICES and volume_id in volume_ids:
-                        volumes.append({
-                            "volume_id": volume_id,
-                            "device_name": device
-                        })
+        for page in pages:
+            for vol in page["Volumes"]:
+                volume_id = vol["VolumeId"]
+                device = next(a["Device"] for a in vol["Attachments"] if a["InstanceId"] == instance_id)
+                if device in EXCLUDE_DEVICES:
+                    continue
+                if volume_ids is not None and volume_id not in volume_ids:
+                    continue
+                volumes.append({
+                    "volume_id": volume_id,
+                    "device_name": device,
+                    "az": vol["AvailabilityZone"],
+                    "size": vol["Size"],
+                    "iops": vol.get("Iops") or 0,
+                    "throughput": vol.get("Throughput") or 0,
+                    "volume_type": vol["VolumeType"],
+                    "encrypted": vol["Encrypted"],
+                    "kms_key_id": vol.get("KmsKeyId"),
+                    "tags": vol.get("Tags", []),
+                })
 
         return volumes
 
     except ClientError as e:
-        print(f"[ERROR] Unable to fetch volumes for instance {instance_id}: {e}")
+        logger.error(f"Unable to fetch volumes for instance {instance_id}: {e}")
         return []
 
-def get_attached_volumes(instance_id):
-    try:
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        volumes = []
-
-        for reservation in response["Reservations"]:
-            for instance in reservation["Instances"]:
-                for mapping in instance.get("BlockDeviceMappings", []):
-                    device = mapping.get("DeviceName")
-                    volume_id = mapping.get("Ebs", {}).get("VolumeId")
-                    if device not in EXCLUDE_DEVICES:
-                        volumes.append({
-                            "volume_id": volume_id,
-                            "device_name": device
-                        })
-
-        return volumes
-
-    except ClientError as e:
-        print(f"[ERROR] Unable to fetch volumes for instance {instance_id}: {e}")
-        return []
+# Snapshot every selected volume with one multi-volume create_snapshots call.
+# Unselected volumes (and the root volume unless selected) are excluded using the
+# cached instance description. Returns {volume_id: snapshot_id}.
+def start_snapshots(instance_id, volumes):
+    instance_info, _, _ = describe_instance_once(instance_id)
+    root_device = instance_info.get("RootDeviceName")
+    selected = {v["volume_id"] for v in volumes}
+    exclude_boot = True
+    exclude_data = []
+
+    for mapping in instance_info.get("BlockDeviceMappings", []):
+        volume_id = mapping.get("Ebs", {}).get("VolumeId")
+        if mapping.get("DeviceName") == root_device:
+            exclude_boot = volume_id not in selected
+        elif volume_id not in selected:
+            exclude_data.append(volume_id)
+
+    spec = {"InstanceId": instance_id, "ExcludeBootVolume": exclude_boot}
+    if exclude_data:
+        spec["ExcludeDataVolumeIds"] = exclude_data
+    response = ec2.create_snapshots(
+        InstanceSpecification=spec,
+        Description=f"Snapshot of {instance_id} volumes before swap",
+        CopyTagsFromSource="volume"
+    )
+    return {snap["VolumeId"]: snap["SnapshotId"] for snap in response["Snapshots"]}
 
 # Step 8: Snapshot and swap function
 def snapshot_and_swap(volume_info):
     volume_id = volume_info["volume_id"]
     device_name = volume_info["device_name"]
+    name_tag = volume_info["name_tag"]
+    sg_names = volume_info["sg_names"]
+    # One timestamp per swap, shared by both DynamoDB records
+    timestamp = datetime.now(timezone.utc).isoformat()
+    # Resources created so far; returned so main() can clean up after a failure
+    progress = {"snapshot_id": None, "new_volume_id": None, "detached": False, "attached": False}
     try:
-        print(f"[INFO] Processing volume {volume_id} ({device_name})")
-
-        volume = ec2_resource.Volume(volume_id)
-        volume.load()
-        az = volume.availability_zone
-        size = volume.size
-        iops = volume.iops or 0
-        throughput = getattr(volume, "throughput", 0) or 0
-        volume_type = volume.volume_type
-        encrypted = volume.encrypted
-        kmskey = volume.kms_key_id
-        tags = volume.tags or []
-
-        instance_info = ec2.describe_instances(InstanceIds=[INSTANCE_ID])["Reservations"][0]["Instances"][0]
-        sg_names = ",".join([sg["GroupName"] for sg in instance_info.get("SecurityGroups", [])])
-        name_tag = next((tag["Value"] for tag in instance_info.get("Tags", []) if tag["Key"] == "Name"), "Unknown")
-
-        snapshot = ec2.create_snapshot(
-            VolumeId=volume_id,
-            Description=f"Snapshot of {volume_id} before swap"
-        )
-        snapshot_id = snapshot["SnapshotId"]
-        print(f"[INFO] Snapshot {snapshot_id} initiated.")
-        print(f"[INFO] KMS Key used: {kmskey}")
-        ec2.get_waiter("snapshot_completed").wait(SnapshotIds=[snapshot_id])
-        print(f"[INFO] Snapshot {snapshot_id} completed.")
+        logger.info(f"Processing volume {volume_id} ({device_name})")
+
+        az = volume_info["az"]
+        size = volume_info["size"]
+        iops = volume_info["iops"]
+        throughput = volume_info["throughput"]
+        volume_type = volume_info["volume_type"]
+        encrypted = volume_info["encrypted"]
+        kmskey = volume_info["kms_key_id"]
+        tags = volume_info["tags"]
 
         snapshot_tags = merge_tags(tags, [
             {"Key": "Name", "Value": f"Snapshot-of-{volume_id}"},
@@ -197,119 +377,179 @@ def snapshot_and_swap(volume_info):
             {"Key": "SecurityGroupName", "Value": sg_names},
             {"Key": "kms_key_id", "Value": str(kmskey)},
         ])
-        ec2.create_tags(Resources=[snapshot_id], Tags=snapshot_tags)
-        record_old_volume(volume_id, INSTANCE_ID, name_tag, device_name, size, iops, throughput, snapshot_id)
+
+        # Normally started by main() via create_snapshots, which can only apply one
+        # tag set to every snapshot; the single-snapshot fallback tags at creation
+        snapshot_id = volume_info.get("snapshot_id")
+        if snapshot_id:
+            progress["snapshot_id"] = snapshot_id
+            ec2.create_tags(Resources=[snapshot_id], Tags=snapshot_tags)
+        else:
+            snapshot = ec2.create_snapshot(
+                VolumeId=volume_id,
+                Description=f"Snapshot of {volume_id} before swap",
+                TagSpecifications=[{
+                    "ResourceType": "snapshot",
+                    "Tags": snapshot_tags
+                }]
+            )
+            snapshot_id = snapshot["SnapshotId"]
+            progress["snapshot_id"] = snapshot_id
+            logger.info(f"Snapshot {snapshot_id} initiated.")
+        logger.info(f"KMS Key used: {kmskey}")
+        snapshot_watcher.wait(snapshot_id, "completed", SNAPSHOT_TIMEOUT, failed_states=("error",))
+        logger.info(f"Snapshot {snapshot_id} completed.")
+
+        record_old_volume(volume_id, INSTANCE_ID, name_tag, device_name,
+                          size, iops, throughput, snapshot_id, timestamp)
 
         extra_tags = merge_tags(tags, [
             {"Key": "Name", "Value": f"Recreated-{volume_id}"},
             {"Key": "SourceSnapshot", "Value": snapshot_id}
         ])
 
-        new_volume = ec2.create_volume(
+        volume_kwargs = dict(
             SnapshotId=snapshot_id,
             AvailabilityZone=az,
             VolumeType=volume_type,
             Encrypted=encrypted,
-            Iops=iops,
-            Throughput=throughput,
             Size=size,
-            KmsKeyId=kmskey,
             TagSpecifications=[{
                 "ResourceType": "volume",
                 "Tags": extra_tags
             }]
         )
+        # Unencrypted volumes have no key, and botocore rejects KmsKeyId=None
+        if kmskey:
+            volume_kwargs["KmsKeyId"] = kmskey
+        # gp2/st1/sc1/standard reject Iops and Throughput outright
+        if volume_type in IOPS_VOLUME_TYPES and iops:
+            volume_kwargs["Iops"] = iops
+        if volume_type in THROUGHPUT_VOLUME_TYPES and throughput:
+            volume_kwargs["Throughput"] = throughput
+        new_volume = ec2.create_volume(**volume_kwargs)
         new_volume_id = new_volume["VolumeId"]
-        print(f"[INFO] New volume {new_volume_id} creation started...")
-        ec2.get_waiter("volume_available").wait(VolumeIds=[new_volume_id])
-        print(f"[INFO] New volume {new_volume_id} is now available.")
+        progress["new_volume_id"] = new_volume_id
+        logger.info(f"New volume {new_volume_id} creation started...")
+        volume_watcher.wait(new_volume_id, "available", VOLUME_TIMEOUT, failed_states=("error",))
+        logger.info(f"New volume {new_volume_id} is now available.")
 
-        record_new_volume(new_volume_id, snapshot_id, INSTANCE_ID, name_tag, device_name,
-                          size, iops, throughput, volume_type, az, sg_names)
+        record_new_volume(new_volume_id, snapshot_id, INSTANCE_ID, name_tag,
+                          device_name, size, iops, throughput, volume_type, az, sg_names, timestamp)
 
-        print(f"[INFO] Detaching old volume {volume_id}...")
+        logger.info(f"Detaching old volume {volume_id}...")
+        # Set before the call: once a detach may have happened the new volume must be kept
+        progress["detached"] = True
         ec2.detach_volume(VolumeId=volume_id, InstanceId=INSTANCE_ID, Force=True  )
-        ec2.get_waiter("volume_available").wait(VolumeIds=[volume_id]) 
-        print(f"[INFO] Old volume {volume_id} detached.")
+        volume_watcher.wait(volume_id, "available", VOLUME_TIMEOUT)
+        logger.info(f"Old volume {volume_id} detached.")
 
-        print(f"[INFO] Attaching new volume {new_volume_id} to device {device_name}...")
+        logger.info(f"Attaching new volume {new_volume_id} to device {device_name}...")
         ec2.attach_volume(
             VolumeId=new_volume_id,
             InstanceId=INSTANCE_ID,
             Device=device_name
         )
+        progress["attached"] = True
         ec2.create_tags(
             Resources=[volume_id],
             Tags=[{"Key": "Name", "Value": f"OLD-{volume_id}"}]
         )
-        print(f"[SUCCESS] Volume {volume_id} swapped with {new_volume_id} using snapshot {snapshot_id}. Size: {size} GiB")
+        logger.info(f"SUCCESS: Volume {volume_id} swapped with {new_volume_id} using snapshot {snapshot_id}. Size: {size} GiB")
+        return ("ok", volume_id, progress)
 
+    # sys.exit() here would only end this worker thread (and be swallowed by its
+    # future), so report the failure and let main() decide what to do.
     except WaiterError as we:
-        print(f"[ERROR] Waiter failed for volume {volume_id}: {we}")
-        sys.exit(1)
+        logger.error(f"Waiter failed for volume {volume_id}: {we}")
+        progress["error"] = f"Waiter failed: {we}"
     except ClientError as e:
-        print(f"[ERROR] AWS client error on volume {volume_id}: {e}")
-        sys.exit(1)
+        logger.error(f"AWS client error on volume {volume_id}: {e}")
+        progress["error"] = f"AWS client error: {e}"
     except Exception as ex:
-        print(f"[ERROR] Unexpected error on volume {volume_id}: {ex}")
-        sys.exit(1)
-        #raise
+        logger.error(f"Unexpected error on volume {volume_id}: {ex}")
+        progress["error"] = f"Unexpected error: {ex}"
+    return ("error", volume_id, progress)
+
+# Delete replacement volumes that never got swapped in. Snapshots are kept as
+# backups, and nothing is deleted once the old volume may have been detached.
+def cleanup_failed_swaps(failures):
+    for _, volume_id, detail in failures:
+        new_volume_id = detail["new_volume_id"]
+        if detail["snapshot_id"]:
+            logger.info(f"Keeping snapshot {detail['snapshot_id']} of {volume_id} as a backup.")
+        if not new_volume_id:
+            continue
+        if detail["attached"]:
+            logger.warning(f"{new_volume_id} replaced {volume_id}, but the old volume was not renamed OLD-{volume_id}.")
+            continue
+        if detail["detached"]:
+            logger.warning(f"Old volume {volume_id} may be detached; attach {new_volume_id} or reattach it manually.")
+            continue
+        try:
+            ec2.delete_volume(VolumeId=new_volume_id)
+            logger.info(f"Deleted orphaned volume {new_volume_id} created for {volume_id}.")
+        except ClientError as e:
+            logger.error(f"Could not delete orphaned volume {new_volume_id}, remove it manually: {e}")
 
 # Step 9: Main driver
 def main():
-    print("Inside script")
-    print(REGION)
-    print(INSTANCE_ID)
-    print(volume_ids_csv)
-    if volume_ids_csv and volume_ids_csv != "AllVolumes" and volume_ids_csv.strip():
-        all_volumes = get_filtered_attached_volumes(INSTANCE_ID, volume_ids_csv)
-        print("filtered volume ids")
+    logger.info("Inside script")
+    logger.info(REGION)
+    logger.info(INSTANCE_ID)
+    logger.info(volume_ids_csv)
+    volume_ids = parse_volume_ids(volume_ids_csv)
+    if volume_ids is not None:
+        # Only separators were given: nothing can match, so skip the describe call
+        all_volumes = get_attached_volumes(INSTANCE_ID, volume_ids) if volume_ids else []
+        logger.info("filtered volume ids")
     else:
         all_volumes = get_attached_volumes(INSTANCE_ID)
-        print("All volumes")
+        logger.info("All volumes")
     
-    print(all_volumes)
+    logger.info(all_volumes)
 
     if not all_volumes:
-        print("[WARN] No eligible volumes found.")
+        logger.warning("No eligible volumes found.")
         return
 
-    print("[INFO] The following volumes will be processed:")
-    for v in all_volumes:
-        print(f"  - {v['volume_id']} ({v['device_name']})")
-
-    with ThreadPoolExecutor(max_workers=len(all_volumes)) as executor:
-        executor.map(snapshot_and_swap, all_volumes)
-
-    print("[INFO] All volume operations completed.")
-
-# Step 10: Main drivers
-def main():
-    print("Inside script")
-    print(REGION)
-    print(INSTANCE_ID)
-    print(volume_ids_csv)
-    if volume_ids_csv and volume_ids_csv != "AllVolumes" and volume_ids_csv.strip():
-        all_volumes = get_filtered_attached_volumes(INSTANCE_ID, volume_ids_csv)
-        print("filtered volume ids")
-    else:
-        all_volumes = get_attached_volumes(INSTANCE_ID)
-        print("All volumes")
-    
-    print(all_volumes)
+    try:
+        _, name_tag, sg_names = describe_instance_once(INSTANCE_ID)
+    except ClientError as e:
+        logger.error(f"Unable to describe instance {INSTANCE_ID}: {e}")
+        sys.exit(1)
 
-    if not all_volumes:
-        print("[WARN] No eligible volumes found.")
-        return
+    try:
+        snapshot_ids = start_snapshots(INSTANCE_ID, all_volumes)
+        logger.info(f"Snapshots initiated: {snapshot_ids}")
+    except ClientError as e:
+        logger.warning(f"create_snapshots failed, snapshotting volumes individually: {e}")
+        snapshot_ids = {}
 
-    print("[INFO] The following volumes will be processed:")
+    logger.info("The following volumes will be processed:")
     for v in all_volumes:
-        print(f"  - {v['volume_id']} ({v['device_name']})")
+        v["name_tag"] = name_tag
+        v["sg_names"] = sg_names
+        v["snapshot_id"] = snapshot_ids.get(v["volume_id"])
+        logger.info(f"  - {v['volume_id']} ({v['device_name']})")
 
-    with ThreadPoolExecutor(max_workers=len(all_volumes)) as executor:
-        executor.map(snapshot_and_swap, all_volumes)
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(all_volumes))) as executor:
+            results = list(executor.map(snapshot_and_swap, all_volumes))
+    finally:
+        db_errors = flush_records()
+
+    failures = [result for result in results if result[0] == "error"]
+    if failures:
+        for _, volume_id, detail in failures:
+            logger.error(f"Volume {volume_id} was not swapped: {detail['error']}")
+        cleanup_failed_swaps(failures)
+        logger.error(f"{len(failures)} of {len(results)} volume swaps failed.")
+    if failures or db_errors:
+        sys.exit(1)
 
-    print("[INFO] All volume operations completed.")
+    logger.info("All volume operations completed.")
 
 if __name__ == "__main__":
     main()